@@ -8,6 +8,7 @@ making it easy to customize system prompts and message formatting.
 
 Features:
 - System prompt formatting with project context
+- Prompt cache keys for OpenAI's server-side prompt caching
 - OpenAI message format conversion
 - Clean separation of prompt logic from main processing
 - Easy customization for different use cases
@@ -27,9 +28,19 @@ Example:
     )
 """
 
-from typing import List, Dict, Any
+import hashlib
+import sys
+import warnings
+from functools import lru_cache
+from typing import List, Dict, Any, Union
 
+from memory import ConversationHistory
 
+# Default system prompt, returned as-is when no custom messages are configured
+_DEFAULT_SYSTEM_PROMPT = sys.intern("You are a helpful AI assistant.")
+
+
+@lru_cache(maxsize=256)
 def format_system_prompt(system_message: str = None, project_system_message: str = None) -> str:
     """
     Format system prompt for OpenAI from agent's configuration.
@@ -46,6 +57,14 @@ def format_system_prompt(system_message: str = None, project_system_message: str
     Returns:
         Formatted system prompt string ready for OpenAI API
         
+    Note:
+        OpenAI caches prompts by their longest stable prefix. Keep the shared
+        instructions first and per-project details last (as done here) so
+        requests from different projects still share the cached prefix.
+        
+        Results are memoized per (system_message, project_system_message), so
+        threads of the same agent reuse one prompt string.
+        
     Example:
         # Basic usage with default prompt
         prompt = format_system_prompt()
@@ -62,20 +81,41 @@ def format_system_prompt(system_message: str = None, project_system_message: str
         )
         # Returns: "You are a helpful AI assistant.\n\nProject Context: This project is about customer support for a tech company."
     """
-    base_prompt = "You are a helpful AI assistant."
+    if not project_system_message:
+        return system_message or _DEFAULT_SYSTEM_PROMPT
+    
+    return f"{system_message or _DEFAULT_SYSTEM_PROMPT}\n\nProject Context: {project_system_message}"
+
+
+@lru_cache(maxsize=256)
+def get_prompt_cache_key(system_prompt: str) -> str:
+    """
+    Build a prompt cache key for OpenAI chat completions.
     
-    if system_message:
-        base_prompt = system_message
+    Requests sent with the same prompt_cache_key are routed to the same
+    prompt cache, which raises the cached-token ratio for agents/projects
+    that reuse a system prompt. The key is derived from the system prompt,
+    so each distinct agent/project configuration gets its own key.
     
-    if project_system_message:
-        base_prompt += f"\n\nProject Context: {project_system_message}"
+    Args:
+        system_prompt: The formatted system prompt from format_system_prompt
     
-    return base_prompt
+    Returns:
+        Short hex digest identifying the system prompt
+        
+    Example:
+        stream = client.chat.completions.create(
+            model="gpt-4o",
+            messages=messages,
+            extra_body={"prompt_cache_key": get_prompt_cache_key(system_prompt)}
+        )
+    """
+    return hashlib.sha256(system_prompt.encode()).hexdigest()[:32]
 
 
 def format_messages_for_openai(
     system_prompt: str, 
-    conversation_history: List[Dict[str, str]], 
+    conversation_history: Union[ConversationHistory, List[Dict[str, str]]], 
     current_message: str
 ) -> List[Dict[str, str]]:
     """
@@ -87,10 +127,10 @@ def format_messages_for_openai(
     
     Args:
         system_prompt: The formatted system prompt defining AI behavior
-        conversation_history: List of previous conversation messages, each containing:
-                            - role: "user" or "assistant"
-                            - content: The message text
-                            - timestamp: Message timestamp (not used by OpenAI)
+        conversation_history: Previous conversation messages as a ConversationHistory
+                            (from ConversationManager.get_conversation). A list of
+                            dictionaries with role/content keys is still accepted but
+                            deprecated.
         current_message: The current user message to process
     
     Returns:
@@ -102,10 +142,7 @@ def format_messages_for_openai(
         # Format messages for OpenAI
         messages = format_messages_for_openai(
             system_prompt="You are a helpful assistant.",
-            conversation_history=[
-                {"role": "user", "content": "Hello", "timestamp": "..."},
-                {"role": "assistant", "content": "Hi there!", "timestamp": "..."}
-            ],
+            conversation_history=manager.get_conversation("thread_1"),  # Hello / Hi there!
             current_message="How are you today?"
         )
         
@@ -118,20 +155,24 @@ def format_messages_for_openai(
         # ]
         
     Note:
-        The timestamp field from conversation history is ignored as OpenAI
-        doesn't use it. Only role and content are included in the API request.
+        Message timestamps are not sent, as OpenAI doesn't use them. Stored
+        ConversationHistory messages are already role/content dicts and are
+        included as-is, so they must not be modified through the result.
     """
-    # Start with system prompt
-    messages = [{"role": "system", "content": system_prompt}]
-    
-    # Add conversation history (excluding timestamp)
-    for msg in conversation_history:
-        messages.append({
-            "role": msg["role"],
-            "content": msg["content"]
-        })
-    
-    # Add current user message
-    messages.append({"role": "user", "content": current_message})
+    if isinstance(conversation_history, ConversationHistory):
+        history = conversation_history.messages
+    else:
+        warnings.warn(
+            "Passing conversation history as a list of dicts is deprecated; "
+            "use ConversationManager.get_conversation() instead",
+            DeprecationWarning,
+            stacklevel=2
+        )
+        history = [{"role": msg["role"], "content": msg["content"]} for msg in conversation_history]
     
-    return messages
+    # System prompt, history and the current user message as a single list
+    return [
+        {"role": "system", "content": system_prompt},
+        *history,
+        {"role": "user", "content": current_message},
+    ]
@@ -10,23 +10,86 @@ Key Features:
 - Function schema definitions
 - Function execution and error handling
 - Streaming progress updates to Lexia
+- Image caching, request coalescing and rate limit retries
 
 Author: Lexia Team
 License: MIT
 """
 
 import asyncio
+import hashlib
 import logging
 import os
 import json
-from openai import OpenAI
+import math
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from openai import AsyncOpenAI, RateLimitError
 from lexia import Variables
 
+# orjson parses function call arguments several times faster when available
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Exact-match cache of generated images: key -> (created_at, image_url), oldest first.
+# DALL-E URLs expire 60 minutes after generation, so entries are only reused within
+# the TTL, which is capped at IMAGE_CACHE_MAX_TTL to leave the client time to load them.
+IMAGE_CACHE_MAX_TTL = 50 * 60
+IMAGE_CACHE_TTL = min(float(os.environ.get('LEXIA_IMAGE_CACHE_TTL', IMAGE_CACHE_MAX_TTL)), IMAGE_CACHE_MAX_TTL)
+IMAGE_CACHE_SIZE = 1024
+_IMAGE_CACHE: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+_IMAGE_CACHE_LOCK = threading.Lock()
+
+# Semantic cache for paraphrased prompts ("mountain sunset" vs "sunset over mountains").
+# Opt-in via LEXIA_IMAGE_SEMANTIC_CACHE=1, since it adds an embeddings call to every
+# exact-cache miss. Entries: (normalized_embedding, (size, quality, style), created_at, image_url)
+IMAGE_SEMANTIC_CACHE = os.environ.get('LEXIA_IMAGE_SEMANTIC_CACHE', 'false').lower() in ('true', '1', 'yes', 'y', 'on')
+IMAGE_EMBEDDING_MODEL = "text-embedding-3-small"
+IMAGE_SEMANTIC_THRESHOLD = float(os.environ.get('LEXIA_IMAGE_SEMANTIC_THRESHOLD', 0.92))
+_SEMANTIC_CACHE: deque = deque(maxlen=256)
+
+# OpenAI clients by API key, least recently used first, so the underlying HTTP
+# connection pool is reused across calls. The SDK's httpx client is safe to share
+# between coroutines of one event loop, so each loop keeps its own clients (see
+# _LoopState). Evicted clients may still be serving a request, so they are closed
+# after OPENAI_CLIENT_CLOSE_DELAY seconds (the SDK's default request timeout).
+OPENAI_CLIENT_CACHE_SIZE = 32
+OPENAI_CLIENT_CLOSE_DELAY = 600.0
+
+# Cap concurrent DALL-E requests so gathered function calls can't oversubscribe
+# the rate limit, and retry 429s after the delay the API asks for.
+MAX_CONCURRENT_IMAGES = int(os.environ.get('LEXIA_MAX_CONCURRENT_IMAGES', 4))
+IMAGE_MAX_ATTEMPTS = 5
+
+# Static status messages streamed by _execute_generate_image
+_MSG_EXEC_GENERATE_IMAGE = "\n🚀 **Executing function:** generate_image"
+_MSG_COMPLETE_GENERATE_IMAGE = "\n✅ **Function completed successfully:** generate_image"
+
+# Send consecutive status chunks as one stream_chunk call (one publish to Lexia)
+# instead of one call per chunk. Opt-in via LEXIA_STREAM_COALESCE=1.
+STREAM_COALESCE = os.environ.get('LEXIA_STREAM_COALESCE', 'false').lower() in ('true', '1', 'yes', 'y', 'on')
+
+# OpenAI API keys by variables content, least recently used first. Agents send the
+# same variables on every message, so one entry serves all of an agent's threads.
+_API_KEY_CACHE: "OrderedDict[tuple, str]" = OrderedDict()
+_API_KEY_CACHE_SIZE = 128
+
+# Futures and locks belong to the event loop that created them, and Lexia dev mode
+# runs each message on a new event loop, so that state is kept per running loop.
+# Entries go away with their loop.
+_LOOP_STATES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+_LOOP_STATES_LOCK = threading.Lock()
+
 # Available functions schema for OpenAI
-AVAILABLE_FUNCTIONS = [
+# A tuple so callers can't append to or reorder the shared schema.
+AVAILABLE_FUNCTIONS = (
     {
         "type": "function",
         "function": {
@@ -58,15 +121,300 @@ AVAILABLE_FUNCTIONS = [
                 "required": ["prompt"]
             }
         }
-    }
-]
+    },
+)
+
+# The schema never changes at runtime, so serialize it once for raw HTTP payloads
+_AVAILABLE_FUNCTIONS_JSON = json.dumps(AVAILABLE_FUNCTIONS).encode()
+
+class _LoopState:
+    """
+    Per-event-loop state of the image generation pipeline.
+    
+    Attributes:
+        inflight (dict): Identical requests currently being generated: key -> Future[image_url]
+        inflight_lock (asyncio.Lock): Guards inflight
+        image_semaphore (asyncio.Semaphore): Caps concurrent DALL-E requests at MAX_CONCURRENT_IMAGES
+        clients (OrderedDict): OpenAI clients by API key, least recently used first
+        evicted_clients (dict): Evicted clients by the task that closes them later
+    """
+    
+    __slots__ = ('inflight', 'inflight_lock', 'image_semaphore', 'clients', 'evicted_clients')
+    
+    def __init__(self):
+        self.inflight: dict[str, asyncio.Future] = {}
+        self.inflight_lock = asyncio.Lock()
+        self.image_semaphore = asyncio.Semaphore(MAX_CONCURRENT_IMAGES)
+        self.clients: "OrderedDict[str, AsyncOpenAI]" = OrderedDict()
+        self.evicted_clients: dict[asyncio.Task, AsyncOpenAI] = {}
+
+def _loop_state() -> _LoopState:
+    """Return the state for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    state = _LOOP_STATES.get(loop)
+    if state is None:
+        with _LOOP_STATES_LOCK:
+            state = _LOOP_STATES.get(loop)
+            if state is None:
+                state = _LOOP_STATES[loop] = _LoopState()
+    return state
+
+def _image_cache_key(prompt: str, size: str, quality: str, style: str) -> str:
+    """Build the exact-match cache key for an image generation request."""
+    payload = json.dumps({"p": prompt, "s": size, "q": quality, "st": style}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _get_cached_image(cache_key: str) -> str:
+    """
+    Look up a previously generated image URL.
+    
+    Args:
+        cache_key: Key produced by _image_cache_key
+        
+    Returns:
+        str: Cached image URL, or None if missing or older than IMAGE_CACHE_TTL
+    """
+    with _IMAGE_CACHE_LOCK:
+        entry = _IMAGE_CACHE.get(cache_key)
+        if entry is None:
+            return None
+        created_at, image_url = entry
+        if time.time() - created_at > IMAGE_CACHE_TTL:
+            del _IMAGE_CACHE[cache_key]
+            return None
+        return image_url
+
+def _store_cached_image(cache_key: str, created_at: float, image_url: str) -> None:
+    """
+    Add an image URL to the exact-match cache. Call with _IMAGE_CACHE_LOCK held.
+    
+    Entries are kept oldest first, so expired ones are swept from the front
+    and the cache never holds more than IMAGE_CACHE_SIZE entries.
+    """
+    _IMAGE_CACHE[cache_key] = (created_at, image_url)
+    _IMAGE_CACHE.move_to_end(cache_key)
+    
+    expired_before = created_at - IMAGE_CACHE_TTL
+    while _IMAGE_CACHE:
+        oldest_created_at, _ = next(iter(_IMAGE_CACHE.values()))
+        if oldest_created_at >= expired_before and len(_IMAGE_CACHE) <= IMAGE_CACHE_SIZE:
+            break
+        _IMAGE_CACHE.popitem(last=False)
+
+def get_openai_client(openai_api_key: str) -> AsyncOpenAI:
+    """Return the shared async OpenAI client for an API key, creating it on first use.
+
+    main.py uses the same clients for chat completions, so image generation
+    reuses their connection pools. Clients are cached per running event loop,
+    since a connection pool only works on the loop that created it and Lexia
+    dev mode runs every message on a new loop. At most OPENAI_CLIENT_CACHE_SIZE
+    clients are kept per loop; the least recently used one is evicted and
+    closed after a delay. Must be called from the event loop.
+    """
+    state = _loop_state()
+    clients = state.clients
+    client = clients.get(openai_api_key)
+    if client is not None:
+        clients.move_to_end(openai_api_key)
+        return client
+    
+    client = clients[openai_api_key] = AsyncOpenAI(api_key=openai_api_key)
+    if len(clients) > OPENAI_CLIENT_CACHE_SIZE:
+        _, evicted = clients.popitem(last=False)
+        task = asyncio.get_running_loop().create_task(_close_client_later(evicted))
+        state.evicted_clients[task] = evicted
+        task.add_done_callback(state.evicted_clients.pop)
+    return client
+
+async def _close_client_later(client: AsyncOpenAI) -> None:
+    """Close an evicted client once requests that may still use it have finished."""
+    await asyncio.sleep(OPENAI_CLIENT_CLOSE_DELAY)
+    await client.close()
+
+async def close_openai_clients() -> None:
+    """Close the running event loop's shared and evicted OpenAI clients and their connection pools (call on app shutdown)."""
+    state = _loop_state()
+    clients = list(state.clients.values())
+    state.clients.clear()
+    for task, client in list(state.evicted_clients.items()):
+        task.cancel()
+        clients.append(client)
+    for client in clients:
+        await client.close()
+
+def api_key_from(variables: list) -> str:
+    """
+    Resolve the OpenAI API key from request variables, reusing earlier lookups.
+    
+    The (name, value) pairs of the variables form the cache key, so the
+    Variables scan only runs for variable sets that haven't been seen yet.
+    Variables without name/value attributes are looked up but never cached,
+    so differently shaped lists can't collide on one key.
+    
+    Args:
+        variables: The request's variables (data.variables)
+        
+    Returns:
+        The OpenAI API key, or None if it is not set
+    """
+    try:
+        cache_key = tuple((variable.name, variable.value) for variable in variables or ())
+    except AttributeError:
+        return Variables(variables).get("OPENAI_API_KEY")
+    
+    openai_api_key = _API_KEY_CACHE.get(cache_key)
+    if openai_api_key is not None:
+        _API_KEY_CACHE.move_to_end(cache_key)
+        return openai_api_key
+    
+    openai_api_key = Variables(variables).get("OPENAI_API_KEY")
+    if openai_api_key:
+        _API_KEY_CACHE[cache_key] = openai_api_key
+        if len(_API_KEY_CACHE) > _API_KEY_CACHE_SIZE:
+            _API_KEY_CACHE.popitem(last=False)
+    return openai_api_key
+
+async def _embed_prompt(client: AsyncOpenAI, prompt: str) -> list[float]:
+    """Embed a prompt with IMAGE_EMBEDDING_MODEL."""
+    response = await client.embeddings.create(model=IMAGE_EMBEDDING_MODEL, input=prompt)
+    return response.data[0].embedding
+
+def _find_similar_image(embedding: list[float], params: tuple) -> tuple[list[float], str]:
+    """
+    Find a cached image whose prompt is semantically close to the given one.
+    
+    L2-normalizes the embedding so a dot product is the cosine similarity,
+    then scans a snapshot of the semantic cache. This is CPU-bound pure Python
+    (up to 256 x 1536 multiplications), so callers run it in a worker thread.
+    
+    Args:
+        embedding: Raw prompt embedding from _embed_prompt
+        params: (size, quality, style) tuple that must match exactly
+        
+    Returns:
+        tuple: (normalized embedding, URL of the most similar cached image above
+               IMAGE_SEMANTIC_THRESHOLD or None)
+    """
+    norm = math.sqrt(sum(value * value for value in embedding)) or 1.0
+    embedding = [value / norm for value in embedding]
+    
+    # Copy the entries so the scan doesn't hold the lock the exact cache also uses
+    with _IMAGE_CACHE_LOCK:
+        entries = list(_SEMANTIC_CACHE)
+    
+    now = time.time()
+    best_url, best_score = None, IMAGE_SEMANTIC_THRESHOLD
+    for cached_embedding, cached_params, created_at, image_url in entries:
+        if cached_params != params or now - created_at > IMAGE_CACHE_TTL:
+            continue
+        score = sum(a * b for a, b in zip(embedding, cached_embedding))
+        if score > best_score:
+            best_url, best_score = image_url, score
+    return embedding, best_url
+
+def _retry_after_seconds(error: RateLimitError, default: float) -> float:
+    """Read the Retry-After header from a rate limit error, falling back to default."""
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    try:
+        return float(retry_after) if retry_after is not None else default
+    except ValueError:
+        return default
+
+async def _images_generate_with_retry(client: AsyncOpenAI, **kwargs):
+    """
+    Call client.images.generate, retrying rate limit errors with backoff.
+    
+    Waits for the Retry-After delay when the API provides one, otherwise
+    backs off exponentially (1s, 2s, 4s, ...). Calls on the same event loop
+    share its image semaphore, so at most MAX_CONCURRENT_IMAGES requests are
+    in flight at once.
+    
+    The SDK's own retries are disabled for these calls so this is the only
+    retry policy (at most IMAGE_MAX_ATTEMPTS requests per image).
+    
+    Raises:
+        RateLimitError: If still rate limited after IMAGE_MAX_ATTEMPTS attempts
+    """
+    images = client.with_options(max_retries=0).images
+    async with _loop_state().image_semaphore:
+        for attempt in range(IMAGE_MAX_ATTEMPTS):
+            try:
+                return await images.generate(**kwargs)
+            except RateLimitError as e:
+                if attempt == IMAGE_MAX_ATTEMPTS - 1:
+                    raise
+                delay = _retry_after_seconds(e, default=2 ** attempt)
+                logger.warning("⏳ DALL-E rate limited, retrying in %.1fs (attempt %d/%d)", delay, attempt + 1, IMAGE_MAX_ATTEMPTS)
+                await asyncio.sleep(delay)
+
+async def _generate_image(
+    openai_api_key: str,
+    cache_key: str,
+    prompt: str,
+    size: str,
+    quality: str,
+    style: str,
+    use_cache: bool
+) -> str:
+    """
+    Generate an image with DALL-E 3 after the exact-match cache has missed.
+    
+    Checks the semantic cache first (when use_cache is set and
+    IMAGE_SEMANTIC_CACHE is enabled) and stores the new image in the caches
+    on success.
+    
+    Returns:
+        str: URL of the generated (or semantically cached) image
+    """
+    # Reuse the cached OpenAI client for this key
+    client = get_openai_client(openai_api_key)
+    
+    # Fall back to a semantically similar prompt with the same parameters
+    params = (size, quality, style)
+    embedding = None
+    if use_cache and IMAGE_SEMANTIC_CACHE:
+        try:
+            embedding = await _embed_prompt(client, prompt)
+        except Exception as e:
+            logger.warning("⚠️ Prompt embedding failed, skipping semantic cache: %s", e)
+    if embedding is not None:
+        embedding, similar_url = await asyncio.to_thread(_find_similar_image, embedding, params)
+        if similar_url:
+            logger.info("♻️ Reusing semantically similar DALL-E image: %s", similar_url)
+            return similar_url
+    
+    logger.info("🎨 Generating image with DALL-E 3: %s", prompt)
+    
+    # Generate image using DALL-E 3 without blocking the event loop
+    response = await _images_generate_with_retry(
+        client,
+        model="dall-e-3",
+        prompt=prompt,
+        size=size,
+        quality=quality,
+        style=style,
+        n=1
+    )
+    
+    image_url = response.data[0].url
+    logger.info("✅ Image generated successfully: %s", image_url)
+    
+    with _IMAGE_CACHE_LOCK:
+        created_at = time.time()
+        _store_cached_image(cache_key, created_at, image_url)
+        if embedding is not None:
+            _SEMANTIC_CACHE.append((embedding, params, created_at, image_url))
+    
+    return image_url
 
 async def generate_image_with_dalle(
     prompt: str, 
     variables: list = None,
     size: str = "1024x1024", 
     quality: str = "standard", 
-    style: str = "vivid"
+    style: str = "vivid",
+    use_cache: bool = True
 ) -> str:
     """
     Generate an image using OpenAI's DALL-E 3 model.
@@ -75,11 +423,17 @@ async def generate_image_with_dalle(
     You can extend this pattern to add other AI capabilities like speech synthesis,
     video generation, or custom ML model inference.
     
+    Identical requests (same prompt, size, quality and style) are served from an
+    in-memory cache for LEXIA_IMAGE_CACHE_TTL seconds (default and maximum 50 minutes). With
+    LEXIA_IMAGE_SEMANTIC_CACHE enabled, prompts whose embedding is close enough to a
+    cached one (LEXIA_IMAGE_SEMANTIC_THRESHOLD) reuse that image as well. Concurrent identical requests share a single DALL-E call.
+    
     Args:
         prompt: Detailed text description of the image to generate
         size: Image dimensions - "1024x1024" (square), "1792x1024" (landscape), or "1024x1792" (portrait)
         quality: Image quality - "standard" or "hd" (higher cost but better quality)
         style: Image style - "vivid" (dramatic) or "natural" (realistic)
+        use_cache: Set to False to always generate a fresh image
     
     Returns:
         str: URL of the generated image
@@ -92,34 +446,58 @@ async def generate_image_with_dalle(
         >>> print(f"Generated image: {image_url}")
     """
     try:
-        # Get OpenAI API key using Variables helper class
+        # Get OpenAI API key from the request variables
         if not variables:
             raise ValueError("Variables not provided to generate_image_with_dalle")
         
-        vars = Variables(variables)
-        openai_api_key = vars.get("OPENAI_API_KEY")
+        openai_api_key = api_key_from(variables)
         if not openai_api_key:
             raise ValueError("OpenAI API key not found in variables")
         
-        # Initialize OpenAI client
-        client = OpenAI(api_key=openai_api_key)
+        # Return a previously generated image for an identical request
+        cache_key = _image_cache_key(prompt, size, quality, style)
+        if not use_cache:
+            return await _generate_image(openai_api_key, cache_key, prompt, size, quality, style, use_cache)
         
-        logger.info(f"🎨 Generating image with DALL-E 3: {prompt}")
-        
-        # Generate image using DALL-E 3
-        response = client.images.generate(
-            model="dall-e-3",
-            prompt=prompt,
-            size=size,
-            quality=quality,
-            style=style,
-            n=1
-        )
+        cached_url = _get_cached_image(cache_key)
+        if cached_url:
+            logger.info("♻️ Reusing cached DALL-E image: %s", cached_url)
+            return cached_url
         
-        image_url = response.data[0].url
-        logger.info(f"✅ Image generated successfully: {image_url}")
+        # Share the result of an identical request that is already being generated.
+        # If that request gets cancelled, the waiters take over and generate the image.
+        state = _loop_state()
+        while True:
+            async with state.inflight_lock:
+                pending = state.inflight.get(cache_key)
+                if pending is None or pending.cancelled():
+                    future = state.inflight[cache_key] = asyncio.get_running_loop().create_future()
+                    break
+            
+            logger.info("⏳ Waiting for identical in-flight DALL-E request: %s", prompt)
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                logger.info("🔁 In-flight DALL-E request was cancelled, retrying: %s", prompt)
         
-        return image_url
+        try:
+            image_url = await _generate_image(openai_api_key, cache_key, prompt, size, quality, style, use_cache)
+            future.set_result(image_url)
+            return image_url
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            async with state.inflight_lock:
+                if state.inflight.get(cache_key) is future:
+                    del state.inflight[cache_key]
         
     except Exception as e:
         error_msg = f"Error generating image with DALL-E: {str(e)}"
@@ -144,18 +522,19 @@ async def execute_function_call(
     """
     try:
         function_name = function_call['function']['name']
-        logger.info(f"🔧 Processing function: {function_name}")
+        logger.info("🔧 Processing function: %s", function_name)
         
         # Stream generic function processing start to Lexia
         processing_msg = f"\n⚙️ **Processing function:** {function_name}"
         lexia_handler.stream_chunk(data, processing_msg)
         
-        if function_name == "generate_image":
-            return await _execute_generate_image(function_call, lexia_handler, data)
-        else:
+        handler = _FUNCTION_HANDLERS.get(function_name)
+        if handler is None:
             error_msg = f"Unknown function: {function_name}"
             logger.error(error_msg)
             return f"\n\n❌ **Function Error:** {error_msg}", None
+        
+        return await handler(function_call, lexia_handler, data)
             
     except Exception as e:
         error_msg = f"Error executing function {function_call['function']['name']}: {str(e)}"
@@ -163,6 +542,14 @@ async def execute_function_call(
         function_error = f"\n\n❌ **Function Execution Error:** {error_msg}"
         return function_error, None
 
+def _stream_chunks(lexia_handler, data, chunks: list[str]) -> None:
+    """Stream chunks to Lexia, as a single chunk when STREAM_COALESCE is enabled."""
+    if STREAM_COALESCE:
+        lexia_handler.stream_chunk(data, "".join(chunks))
+    else:
+        for chunk in chunks:
+            lexia_handler.stream_chunk(data, chunk)
+
 async def _execute_generate_image(
     function_call: dict, 
     lexia_handler, 
@@ -180,15 +567,11 @@ async def _execute_generate_image(
         tuple: (result_message, generated_image_url)
     """
     try:
-        args = json.loads(function_call["function"]["arguments"])
-        logger.info(f"🎨 Executing DALL-E image generation with args: {args}")
-        
-        # Stream function execution start to Lexia
-        execution_msg = f"\n🚀 **Executing function:** generate_image"
-        lexia_handler.stream_chunk(data, execution_msg)
+        args = _json_loads(function_call["function"]["arguments"])
+        logger.info("🎨 Executing DALL-E image generation with args: %s", args)
         
-        # Stream image generation start markdown
-        lexia_handler.stream_chunk(data, "[lexia.loading.image.start]")
+        # Stream function execution start and image generation start markdown to Lexia
+        _stream_chunks(lexia_handler, data, [_MSG_EXEC_GENERATE_IMAGE, "[lexia.loading.image.start]"])
         
         # Generate the image using our DALL-E function
         image_url = await generate_image_with_dalle(
@@ -199,22 +582,15 @@ async def _execute_generate_image(
             style=args.get("style", "vivid")
         )
         
-        logger.info(f"✅ DALL-E image generated: {image_url}")
-        
-        # Stream image generation end markdown
-        lexia_handler.stream_chunk(data, "[lexia.loading.image.end]")
-        
-        # Stream function completion to Lexia
-        completion_msg = f"\n✅ **Function completed successfully:** generate_image"
-        lexia_handler.stream_chunk(data, completion_msg)
+        logger.info("✅ DALL-E image generated: %s", image_url)
         
         # Add image generation result to response
         image_result = f"\n\n🎨 **Image Generated Successfully!**\n\n**Prompt:** {args.get('prompt')}\n**Image URL:** [lexia.image.start]{image_url}[lexia.image.end] \n\n*Image created with DALL-E 3*"
         
-        # Stream the image result to Lexia
-        lexia_handler.stream_chunk(data, image_result)
+        # Stream image generation end markdown, function completion and the result to Lexia
+        _stream_chunks(lexia_handler, data, ["[lexia.loading.image.end]", _MSG_COMPLETE_GENERATE_IMAGE, image_result])
         
-        logger.info(f"✅ Image generation completed: {image_url}")
+        logger.info("✅ Image generation completed: %s", image_url)
         
         return image_result, image_url
         
@@ -224,15 +600,33 @@ async def _execute_generate_image(
         function_error = f"\n\n❌ **Function Execution Error:** {error_msg}"
         return function_error, None
 
-def get_available_functions() -> list:
+# Function name -> executor. Register new functions here alongside their
+# schema in AVAILABLE_FUNCTIONS.
+_FUNCTION_HANDLERS = {
+    "generate_image": _execute_generate_image,
+}
+
+def get_available_functions() -> tuple:
     """
-    Get the list of available functions for OpenAI.
+    Get the available functions for OpenAI.
     
     Returns:
-        list: List of function schemas
+        tuple: Function schemas (shared, do not modify)
     """
     return AVAILABLE_FUNCTIONS
 
+def get_available_functions_json() -> bytes:
+    """
+    Get the available functions pre-serialized as JSON.
+    
+    Useful when building raw HTTP payloads, to avoid re-encoding the
+    fixed schema on every request.
+    
+    Returns:
+        bytes: JSON-encoded list of function schemas
+    """
+    return _AVAILABLE_FUNCTIONS_JSON
+
 async def process_function_calls(
     function_calls: list, 
     lexia_handler, 
@@ -250,26 +644,47 @@ async def process_function_calls(
         tuple: (combined_result_message, generated_file_url or None)
     """
     if not function_calls:
-        logger.info("🔧 No function calls to process")
         return "", None
     
-    logger.info(f"🔧 Processing {len(function_calls)} function calls...")
-    logger.info(f"🔧 Function calls details: {function_calls}")
+    logger.info("🔧 Processing %d function calls...", len(function_calls))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🔧 Function calls details: %r", function_calls)
     
-    combined_result = ""
+    parts: list[str] = []
     generated_file_url = None
     
+    # Calls with the same name and arguments are executed once and share the result
+    unique_calls: dict[tuple[str, str], dict] = {}
     for function_call in function_calls:
-        try:
-            result, file_url = await execute_function_call(function_call, lexia_handler, data)
-            combined_result += result
-            
-            if file_url and not generated_file_url:
-                generated_file_url = file_url
-                
-        except Exception as e:
-            error_msg = f"Error processing function call: {str(e)}"
-            logger.error(error_msg, exc_info=True)
-            combined_result += f"\n\n❌ **Function Processing Error:** {error_msg}"
+        call_key = (function_call['function']['name'], function_call['function']['arguments'])
+        unique_calls.setdefault(call_key, function_call)
+    
+    # Function calls are independent I/O-bound work, so run them concurrently.
+    # gather() returns results in input order, keeping the output deterministic.
+    unique_results = await asyncio.gather(
+        *[execute_function_call(function_call, lexia_handler, data) for function_call in unique_calls.values()],
+        return_exceptions=True
+    )
+    results_by_key = dict(zip(unique_calls.keys(), unique_results))
+    results = [
+        results_by_key[(function_call['function']['name'], function_call['function']['arguments'])]
+        for function_call in function_calls
+    ]
+    
+    for outcome in results:
+        # CancelledError is a BaseException, not an Exception, and must propagate
+        if isinstance(outcome, asyncio.CancelledError):
+            raise outcome
+        if isinstance(outcome, BaseException):
+            error_msg = f"Error processing function call: {str(outcome)}"
+            logger.error(error_msg, exc_info=outcome)
+            parts.append(f"\n\n❌ **Function Processing Error:** {error_msg}")
+            continue
+        
+        result, file_url = outcome
+        parts.append(result)
+        
+        if file_url and not generated_file_url:
+            generated_file_url = file_url
     
-    return combined_result, generated_file_url
+    return "".join(parts), generated_file_url
@@ -43,13 +43,47 @@ License: MIT
 """
 
 import sys
+import asyncio
 import logging
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
 import os
-import requests
+import httpx
 import tiktoken
-import PyPDF2
-import io
+import pypdf
+import tempfile
+import threading
+from typing import BinaryIO, Optional
+import json
+import time
+import weakref
+
+# orjson parses and pretty-prints tool call arguments several times faster when available.
+# Its JSONDecodeError subclasses json.JSONDecodeError, so error handling is shared.
+try:
+    import orjson
+    
+    _json_loads = orjson.loads
+    
+    def _json_dumps_pretty(value) -> str:
+        return orjson.dumps(value, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    _json_loads = json.loads
+    
+    def _json_dumps_pretty(value) -> str:
+        return json.dumps(value, indent=2, ensure_ascii=False)
+
+# pypdfium2 (native PDFium bindings) extracts text much faster than pypdf;
+# fall back to pypdf when it isn't installed
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# PDFium is not thread-safe, even with one document per thread, so all pdfium
+# calls are serialized; the pypdf fallback still runs concurrently
+_PDFIUM_LOCK = threading.Lock()
 
 # Configure logging with informative format
 logging.basicConfig(
@@ -58,6 +92,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Optional structured logs: LEXIA_LOG_FORMAT=json emits one JSON object per record
+# (including `extra` fields) when python-json-logger is installed
+if os.environ.get('LEXIA_LOG_FORMAT', '').lower() == 'json':
+    try:
+        from pythonjsonlogger import jsonlogger
+        for handler in logging.getLogger().handlers:
+            handler.setFormatter(jsonlogger.JsonFormatter('%(asctime)s %(name)s %(levelname)s %(message)s'))
+    except ImportError:
+        logger.warning("LEXIA_LOG_FORMAT=json requires python-json-logger; using plain text logs")
+
 # Import AI agent components
 from memory import ConversationManager
 from lexia import (
@@ -67,11 +111,10 @@ from lexia import (
     Variable, 
     create_success_response,
     create_lexia_app,
-    add_standard_endpoints,
-    Variables
+    add_standard_endpoints
 )
-from agent_utils import format_system_prompt, format_messages_for_openai
-from function_handler import get_available_functions, process_function_calls
+from agent_utils import format_system_prompt, format_messages_for_openai, get_prompt_cache_key
+from function_handler import api_key_from, close_openai_clients, get_available_functions, get_openai_client, process_function_calls
 
 # Determine dev/prod mode from CLI flags or env var (default: prod)
 dev_mode_flag = None
@@ -91,6 +134,78 @@ else:
 conversation_manager = ConversationManager(max_history=10)  # Keep last 10 messages per thread
 lexia = LexiaHandler(dev_mode=dev_mode_flag)
 
+# Fallback tokenizer for models tiktoken doesn't know; matches GPT-4 era models
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=8)
+def _get_encoder(model: str) -> tiktoken.Encoding:
+    """
+    Return the tiktoken encoder for a model, loading each BPE table only once.
+    
+    Args:
+        model: OpenAI model name (e.g. "gpt-4o")
+        
+    Returns:
+        The model's encoding, or DEFAULT_ENCODING for unknown models
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+# PDF text is truncated to MAX_PDF_TOKENS before being sent to OpenAI. Texts
+# estimated above the budget are first cut by characters (never fewer than
+# PDF_CHARS_PER_TOKEN per kept token) so tiktoken doesn't encode text that
+# would be dropped anyway.
+MAX_PDF_TOKENS = int(os.environ.get('LEXIA_MAX_PDF_TOKENS', 8000))
+PDF_CHARS_PER_TOKEN = 8
+
+# Downloaded PDFs stay in memory up to this size and spill to a temporary file beyond it
+PDF_SPOOL_MAX_SIZE = 8 << 20
+
+# OpenAI content deltas are often a few characters each. They are buffered and
+# forwarded to Lexia once STREAM_COALESCE_CHARS characters have accumulated or
+# STREAM_COALESCE_INTERVAL seconds have passed since the last forward. Both can be
+# tuned per deployment (e.g. larger batches for busy Centrifugo brokers).
+STREAM_COALESCE_CHARS = int(os.environ.get('LEXIA_STREAM_COALESCE_CHARS', 32))
+STREAM_COALESCE_INTERVAL = float(os.environ.get('LEXIA_STREAM_COALESCE_INTERVAL', 0.03))
+
+# Static prefixes of the tool call status lines streamed to Lexia
+_FN_CALL_PREFIX = "\n🔧 **Calling function:** "
+_FN_PARAMS_PREFIX = "\n⚙️ **Function parameters:** "
+
+# Shared async HTTP clients for file downloads by event loop; each reuses connections
+# across requests. A connection pool only works on the loop that created it, and Lexia
+# dev mode runs every message on a new loop. Entries go away with their loop.
+_HTTP_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_HTTP_CLIENTS_LOCK = threading.Lock()
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _HTTP_CLIENTS.get(loop)
+    if client is None:
+        with _HTTP_CLIENTS_LOCK:
+            client = _HTTP_CLIENTS.get(loop)
+            if client is None:
+                # Lexia file storage is usually a single host, so keep enough idle sockets for bursts
+                client = _HTTP_CLIENTS[loop] = httpx.AsyncClient(
+                    timeout=30.0,
+                    http2=True,
+                    follow_redirects=True,
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=32),
+                )
+    return client
+
+
+async def _close_http_client() -> None:
+    """Close the running event loop's HTTP client, if one was created."""
+    client = _HTTP_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
 # Create the FastAPI app using Lexia's web utilities
 app = create_lexia_app(
     title="Lexia AI Agent Starter Kit",
@@ -98,6 +213,266 @@ app = create_lexia_app(
     description="Production-ready AI agent starter kit with Lexia integration"
 )
 
+
+def _configure_default_executor() -> None:
+    """Size the default thread pool used by asyncio.to_thread for PDF processing."""
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=32))
+
+# Models whose tokenizers are loaded at startup, so the first PDF request doesn't pay for it
+WARMUP_MODELS = tuple(
+    model.strip() for model in os.environ.get('LEXIA_WARMUP_MODELS', 'gpt-4o,gpt-4').split(',') if model.strip()
+)
+
+
+def _warm_up_tokenizers() -> None:
+    """Load and exercise the tokenizers of WARMUP_MODELS (tiktoken may download BPE files)."""
+    for model in WARMUP_MODELS:
+        _get_encoder(model).encode("warmup")
+
+
+async def _warm_up() -> None:
+    """Warm per-process caches in the worker pool without blocking startup on failure."""
+    try:
+        await asyncio.to_thread(_warm_up_tokenizers)
+        logger.info("🔥 Tokenizers warmed up for: %s", ", ".join(WARMUP_MODELS))
+    except Exception as e:
+        logger.warning("Tokenizer warm-up failed, loading on first use instead: %s", e)
+
+# Starlette 1.x removed add_event_handler, so startup and shutdown work runs
+# inside the app's lifespan, around whatever lifespan Lexia configured
+_lexia_lifespan = app.router.lifespan_context
+
+
+@asynccontextmanager
+async def _lifespan(app):
+    """Run Lexia's lifespan, set up and warm the worker pool and release the agent's HTTP clients on shutdown."""
+    async with _lexia_lifespan(app) as state:
+        _configure_default_executor()
+        await _warm_up()
+        try:
+            yield state
+        finally:
+            await _close_http_client()
+            await close_openai_clients()
+
+
+app.router.lifespan_context = _lifespan
+
+
+class _JsonCompletionTracker:
+    """
+    Incrementally tracks whether streamed JSON text has closed its top-level value.
+    
+    Tool call arguments arrive in small fragments. Feeding each fragment here
+    scans it once, so the accumulated arguments are parsed only when they can
+    actually be complete instead of after nearly every fragment.
+    """
+    
+    __slots__ = ('depth', 'in_string', 'escaped')
+    
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+    
+    def feed(self, text: str) -> bool:
+        """
+        Consume the next fragment of JSON text.
+        
+        Args:
+            text: Newly received fragment
+            
+        Returns:
+            bool: True if an object or array closed at the top level in this fragment
+        """
+        closed = False
+        for char in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == '{' or char == '[':
+                self.depth += 1
+            elif char == '}' or char == ']':
+                self.depth -= 1
+                if self.depth == 0:
+                    closed = True
+        return closed
+
+
+def _approx_token_count(text: str) -> int:
+    """
+    Cheaply estimate the token count of a text as its number of words.
+    
+    str.split runs in C, so this is fast even for multi-megabyte PDFs.
+    It undercounts real tokens, which makes it a safe lower bound for
+    deciding that a text is obviously too large.
+    """
+    return len(text.split())
+
+
+def _extract_pdf_text(pdf_file: BinaryIO) -> str:
+    """
+    Extract the text of every page of a PDF.
+    
+    Uses pypdfium2 when available and pypdf otherwise. Extraction is
+    CPU-bound, so process_message runs it in a worker thread to keep the
+    event loop responsive. Pages are read sequentially: neither reader is
+    safe to use from several threads, since pages share one file stream.
+    PDFium isn't thread-safe across documents either, so pdfium extraction
+    runs under _PDFIUM_LOCK, one PDF at a time per process.
+    
+    Args:
+        pdf_file: Seekable PDF file, positioned at the start
+        
+    Returns:
+        str: Extracted text, pages separated by newlines
+    """
+    if pdfium is not None:
+        # Before Python 3.11 SpooledTemporaryFile lacks readinto, which pypdfium2's
+        # buffer input relies on; hand it the underlying BytesIO/temporary file instead
+        pdf_input = getattr(pdf_file, '_file', pdf_file)
+        with _PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(pdf_input)
+            try:
+                return "\n".join(page.get_textpage().get_text_range() for page in pdf)
+            finally:
+                pdf.close()
+    
+    pdf_reader = pypdf.PdfReader(pdf_file)
+    
+    # extract_text() can return None for pages without a text layer
+    return "\n".join(page.extract_text() or "" for page in pdf_reader.pages)
+
+
+def _fit_pdf_text_to_budget(pdf_text: str, model: str) -> tuple[str, Optional[int]]:
+    """
+    Count the tokens of extracted PDF text and truncate it to MAX_PDF_TOKENS.
+    
+    Texts estimated above the budget are cut down by characters before the
+    exact count, and texts that provably fit skip tiktoken entirely. Like extraction, this
+    is CPU-bound and runs in a worker thread.
+    
+    Args:
+        pdf_text: Text extracted from the PDF
+        model: OpenAI model name, used to pick the tokenizer
+        
+    Returns:
+        tuple: (text within the token budget, exact token count or None if it
+               provably fits and wasn't counted)
+    """
+    estimated_tokens = _approx_token_count(pdf_text)
+    if estimated_tokens > MAX_PDF_TOKENS:
+        logger.info("🔢 Estimated token count (at least): %d", estimated_tokens)
+        pdf_text = pdf_text[:MAX_PDF_TOKENS * PDF_CHARS_PER_TOKEN]
+    
+    # Every token covers at least one UTF-8 byte, so texts with no more bytes
+    # than the budget always fit and skip the exact count entirely
+    if len(pdf_text.encode('utf-8')) <= MAX_PDF_TOKENS:
+        logger.debug("🔢 Within token budget without counting (~%d tokens estimated)", len(pdf_text) // 4)
+        return pdf_text, None
+    
+    logger.info("🔢 Counting tokens with tiktoken...")
+    tokenizer = _get_encoder(model)
+    tokens = tokenizer.encode(pdf_text)
+    token_count = len(tokens)
+    logger.info("🔢 Token count: %d", token_count)
+    
+    # Truncate to the token budget so oversized PDFs aren't uploaded and billed
+    if token_count > MAX_PDF_TOKENS:
+        pdf_text = tokenizer.decode(tokens[:MAX_PDF_TOKENS])
+        logger.info("✂️ PDF text truncated from %d to %d tokens", token_count, MAX_PDF_TOKENS)
+        token_count = MAX_PDF_TOKENS
+    
+    return pdf_text, token_count
+
+
+async def _handle_pdf(messages: list, file_url: str, data: ChatMessage) -> None:
+    """
+    Download a PDF, extract its text and append it to the current user message.
+    
+    Errors are logged and the request continues without the PDF content.
+    
+    Args:
+        messages: OpenAI messages for the request; the last one is the user message
+        file_url: URL of the PDF
+        data: The incoming chat message
+    """
+    logger.info("📄 PDF detected: %s", file_url)
+    
+    try:
+        # Download and process PDF content
+        logger.info("📥 Downloading PDF...")
+        # Stream the body into a spooled buffer that the PDF reader uses directly;
+        # large PDFs spill to disk instead of growing resident memory
+        with tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE) as pdf_file:
+            downloaded = 0
+            async with _get_http_client().stream("GET", file_url) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(65536):
+                    downloaded += len(chunk)
+                    if downloaded > PDF_SPOOL_MAX_SIZE:
+                        # Past the spool size (including the rollover write) the buffer is a
+                        # real file, so write from a worker thread instead of the event loop
+                        await asyncio.to_thread(pdf_file.write, chunk)
+                    else:
+                        pdf_file.write(chunk)
+            pdf_file.seek(0)
+            
+            # Extract text from PDF in a worker thread
+            logger.info("📖 Extracting text from PDF...")
+            pdf_text = await asyncio.to_thread(_extract_pdf_text, pdf_file)
+        
+        logger.info("📄 PDF text extracted. Length: %d characters", len(pdf_text))
+        
+        # Count and truncate tokens in the worker pool too, so multi-MB texts
+        # don't block the event loop while being measured
+        pdf_text, token_count = await asyncio.to_thread(_fit_pdf_text_to_budget, pdf_text, data.model)
+        
+        # Add PDF content to the message for context
+        if messages and messages[-1]['role'] == 'user':
+            messages[-1]['content'] = f"{data.message}\n\nPDF Content:\n{pdf_text}"
+            if token_count is None:
+                logger.info("📤 PDF content added to OpenAI request (within %d token budget)", MAX_PDF_TOKENS)
+            else:
+                logger.info("📤 PDF content added to OpenAI request. Total tokens: %d", token_count)
+        
+    except Exception as e:
+        error_msg = f"Error processing PDF: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        # Continue without PDF content if there's an error
+
+
+async def _handle_image(messages: list, file_url: str, data: ChatMessage) -> None:
+    """
+    Attach an image to the current user message for vision analysis.
+    
+    Args:
+        messages: OpenAI messages for the request; the last one is the user message
+        file_url: URL of the image
+        data: The incoming chat message
+    """
+    logger.info("🖼️ Image detected: %s", file_url)
+    if messages and messages[-1]['role'] == 'user':
+        messages[-1]['content'] = [
+            {"type": "text", "text": messages[-1]['content']},
+            {"type": "image_url", "image_url": {"url": file_url}}
+        ]
+        logger.info("🖼️ Image added to OpenAI request for vision analysis")
+
+
+# Attachment handlers by ChatMessage.file_type
+_FILE_HANDLERS = {
+    'pdf': _handle_pdf,
+    'image': _handle_image,
+}
+
+
 async def process_message(data: ChatMessage) -> None:
     """
     Process incoming chat messages using OpenAI and send responses via Lexia.
@@ -128,30 +503,31 @@ async def process_message(data: ChatMessage) -> None:
         - Customize error handling and logging
     """
     try:
-        # Log comprehensive request information for debugging
-        logger.info("=" * 80)
-        logger.info("📥 FULL REQUEST BODY RECEIVED:")
-        logger.info("=" * 80)
-        logger.info(f"Thread ID: {data.thread_id}")
-        logger.info(f"Message: {data.message}")
-        logger.info(f"Response UUID: {data.response_uuid}")
-        logger.info(f"Model: {data.model}")
-        logger.info(f"System Message: {data.system_message}")
-        logger.info(f"Project System Message: {data.project_system_message}")
-        logger.info(f"Variables: {data.variables}")
-        logger.info(f"Stream URL: {getattr(data, 'stream_url', 'Not provided')}")
-        logger.info(f"Stream Token: {getattr(data, 'stream_token', 'Not provided')}")
-        logger.info(f"Full data object: {data}")
-        logger.info("=" * 80)
+        # Log request details for debugging as a single structured record (DEBUG only).
+        # Variable values and the stream token are secrets, so only names/presence are logged.
+        if logger.isEnabledFor(logging.DEBUG):
+            request_fields = {
+                "thread_id": data.thread_id,
+                "user_message": data.message,
+                "response_uuid": data.response_uuid,
+                "model": data.model,
+                "system_message": data.system_message,
+                "project_system_message": data.project_system_message,
+                "variable_names": [getattr(variable, 'name', None) for variable in data.variables or []],
+                "stream_url": getattr(data, 'stream_url', None),
+                "stream_token_provided": bool(getattr(data, 'stream_token', None)),
+                "file_type": getattr(data, 'file_type', None),
+                "file_url": getattr(data, 'file_url', None),
+            }
+            logger.debug("📥 Request received: %s", request_fields, extra=request_fields)
         
         # Log key processing information
-        logger.info(f"🚀 Processing message for thread {data.thread_id}")
-        logger.info(f"📝 Message: {data.message[:100]}...")
-        logger.info(f"🔑 Response UUID: {data.response_uuid}")
+        logger.info("🚀 Processing message for thread %s", data.thread_id)
+        logger.info("📝 Message: %.100s...", data.message)
+        logger.info("🔑 Response UUID: %s", data.response_uuid)
         
-        # Get OpenAI API key using Variables helper class
-        vars = Variables(data.variables)
-        openai_api_key = vars.get("OPENAI_API_KEY")
+        # Get OpenAI API key, skipping the Variables scan for previously seen variables
+        openai_api_key = api_key_from(data.variables)
         if not openai_api_key:
             missing_key_msg = "Sorry, the OpenAI API key is missing or empty. From menu right go to admin mode, then agents and edit the agent in last section you can set the openai key."
             logger.error("OpenAI API key not found or empty in variables")
@@ -159,88 +535,41 @@ async def process_message(data: ChatMessage) -> None:
             lexia.complete_response(data, missing_key_msg)
             return
         
-        # Initialize OpenAI client and conversation management
-        client = OpenAI(api_key=openai_api_key)
+        # Get the cached OpenAI client and update conversation memory
+        client = get_openai_client(openai_api_key)
         conversation_manager.add_message(data.thread_id, "user", data.message)
-        thread_history = conversation_manager.get_history(data.thread_id)
+        thread_history = conversation_manager.get_conversation(data.thread_id)
         
         # Format system prompt and messages for OpenAI
         system_prompt = format_system_prompt(data.system_message, data.project_system_message)
         messages = format_messages_for_openai(system_prompt, thread_history, data.message)
         
-        # Process PDF files if present
-        if hasattr(data, 'file_type') and data.file_type == 'pdf' and hasattr(data, 'file_url') and data.file_url:
-            logger.info(f"📄 PDF detected: {data.file_url}")
-            
-            try:
-                # Download and process PDF content
-                logger.info("📥 Downloading PDF...")
-                response = requests.get(data.file_url)
-                response.raise_for_status()
-                
-                # Extract text from PDF using PyPDF2
-                logger.info("📖 Extracting text from PDF...")
-                pdf_file = io.BytesIO(response.content)
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                
-                pdf_text = ""
-                for page in pdf_reader.pages:
-                    pdf_text += page.extract_text() + "\n"
-                
-                logger.info(f"📄 PDF text extracted. Length: {len(pdf_text)} characters")
-                
-                # Count tokens using tiktoken to prevent API overload
-                logger.info("🔢 Counting tokens with tiktoken...")
-                tokenizer = tiktoken.get_encoding("gpt2")
-                tokens = tokenizer.encode(pdf_text)
-                token_count = len(tokens)
-                
-                logger.info(f"🔢 Token count: {token_count}")
-                
-
-                
-                # Add PDF content to the message for context
-                if messages and messages[-1]['role'] == 'user':
-                    combined_content = f"{data.message}\n\nPDF Content:\n{pdf_text}"
-                    messages[-1]['content'] = combined_content
-                    
-                    logger.info(f"📤 PDF content added to OpenAI request. Total tokens: {token_count}")
-                    
-
-                
-            except Exception as e:
-                error_msg = f"Error processing PDF: {str(e)}"
-                logger.error(error_msg, exc_info=True)
-                # Continue without PDF content if there's an error
-        
-        # Process image files if present
-        elif hasattr(data, 'file_type') and data.file_type == 'image' and hasattr(data, 'file_url') and data.file_url:
-            logger.info(f"🖼️ Image detected: {data.file_url}")
-            # Add image to the last user message for vision analysis
-            if messages and messages[-1]['role'] == 'user':
-                messages[-1]['content'] = [
-                    {"type": "text", "text": messages[-1]['content']},
-                    {"type": "image_url", "image_url": {"url": data.file_url}}
-                ]
-                logger.info("🖼️ Image added to OpenAI request for vision analysis")
+        # Attach PDF or image content to the current user message
+        file_type = getattr(data, 'file_type', None)
+        file_url = getattr(data, 'file_url', None)
+        file_handler = _FILE_HANDLERS.get(file_type)
+        if file_handler is not None and file_url:
+            await file_handler(messages, file_url, data)
         
         # Log OpenAI request details
-        logger.info(f"🤖 Sending to OpenAI model: {data.model}")
-        logger.info(f"💬 System prompt: {system_prompt[:100]}...")
-        logger.info(f"📤 Messages being sent to OpenAI: {messages}")
-        
-        # Get available functions from function handler
-        available_functions = get_available_functions()
+        logger.info("🤖 Sending to OpenAI model: %s (%d messages)", data.model, len(messages))
+        # The full prompt and message list can be large (PDF text, long histories); only
+        # build their reprs when DEBUG logging is enabled
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("💬 System prompt: %.100s...", system_prompt)
+            logger.debug("📤 Messages being sent to OpenAI: %s", messages)
         
         # Stream response from OpenAI with function calling support
-        stream = client.chat.completions.create(
+        stream = await client.chat.completions.create(
             model=data.model,
             messages=messages,
-            tools=available_functions,
+            tools=get_available_functions(),  # Static schema defined once in function_handler
             tool_choice="auto",
             max_tokens=1000,
             temperature=0.7,
-            stream=True
+            stream=True,
+            # Route requests sharing a system prompt to the same OpenAI prompt cache
+            extra_body={"prompt_cache_key": get_prompt_cache_key(system_prompt)}
         )
         
         # Begin a Lexia session (aggregates + streams)
@@ -248,53 +577,98 @@ async def process_message(data: ChatMessage) -> None:
         
         # Process streaming response
         usage_info = None
-        function_calls = []
         generated_image_url = None
         
+        # Tool calls are aggregated as parallel dicts keyed by tool call index;
+        # argument fragments are joined once when the stream ends
+        tc_ids = {}
+        tc_names = {}
+        tc_args = {}
+        # One JSON completion tracker per tool call index
+        arg_trackers = {}
+        
+        # Buffer for coalescing small content deltas into fewer Lexia publishes
+        content_buffer = []
+        content_buffer_len = 0
+        last_flush = time.monotonic()
+        
+        def flush_content() -> None:
+            nonlocal content_buffer_len, last_flush
+            if content_buffer:
+                # Stream chunk to Lexia (handles dev/prod mode internally) and aggregate
+                session.stream("".join(content_buffer))
+                content_buffer.clear()
+                content_buffer_len = 0
+            last_flush = time.monotonic()
+        
+        # Per-stream counters, logged once as a summary after the stream ends
+        content_chunk_count = 0
+        tool_chunk_count = 0
+        response_length = 0
+        
         logger.info("📡 Streaming response from OpenAI...")
         
-        for chunk in stream:
+        # Bind hot-loop attribute lookups to locals once per stream
+        stream_chunk = session.stream
+        buffer_append = content_buffer.append
+        monotonic = time.monotonic
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        
+        async for chunk in stream:
+            choices = chunk.choices
+            if choices:
+                delta = choices[0].delta
+                content = delta.content
+                tool_calls = delta.tool_calls
+            else:
+                content = tool_calls = None
+            
             # Handle content chunks
-            if chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
-                # Stream chunk to Lexia (handles dev/prod mode internally) and aggregate
-                session.stream(content)
+            if content:
+                content_len = len(content)
+                content_chunk_count += 1
+                response_length += content_len
+                buffer_append(content)
+                content_buffer_len += content_len
+                if (content_buffer_len >= STREAM_COALESCE_CHARS
+                        or monotonic() - last_flush >= STREAM_COALESCE_INTERVAL):
+                    flush_content()
             
             # Handle function call chunks
-            if chunk.choices[0].delta.tool_calls:
-                logger.info(f"🔧 Tool call chunk detected: {chunk.choices[0].delta.tool_calls}")
-                for tool_call in chunk.choices[0].delta.tool_calls:
-                    if tool_call.function:
+            if tool_calls:
+                tool_chunk_count += 1
+                if debug_enabled:
+                    logger.debug("🔧 Tool call chunk detected: %s", tool_calls)
+                for tool_call in tool_calls:
+                    function = tool_call.function
+                    if function:
+                        index = tool_call.index
+                        args_parts = tc_args.get(index)
                         # Initialize function call if it's new
-                        if len(function_calls) <= tool_call.index:
-                            function_calls.append({
-                                "id": tool_call.id,
-                                "type": "function",
-                                "function": {
-                                    "name": tool_call.function.name,
-                                    "arguments": ""
-                                }
-                            })
-                            logger.info(f"🔧 New function call initialized: {tool_call.function.name}")
+                        if args_parts is None:
+                            tc_ids[index] = tool_call.id
+                            tc_names[index] = function.name
+                            args_parts = tc_args[index] = []
+                            arg_trackers[index] = _JsonCompletionTracker()
+                            logger.info("🔧 New function call initialized: %s", function.name)
                             
-                            # Stream function call announcement to Lexia
-                            function_msg = f"\n🔧 **Calling function:** {tool_call.function.name}"
-                            session.stream(function_msg)
+                            # Stream function call announcement to Lexia (after any buffered text)
+                            flush_content()
+                            stream_chunk(_FN_CALL_PREFIX + function.name)
                         
                         # Accumulate function arguments
-                        if tool_call.function.arguments:
-                            function_calls[tool_call.index]["function"]["arguments"] += tool_call.function.arguments
-                            logger.info(f"🔧 Accumulated arguments for function {tool_call.index}: {tool_call.function.arguments}")
+                        arguments = function.arguments
+                        if arguments:
+                            args_parts.append(arguments)
+                            if debug_enabled:
+                                logger.debug("🔧 Accumulated arguments for function %d: %s", index, arguments)
                             
-                            # Stream function execution progress to Lexia
+                            # Stream function parameters to Lexia once the arguments JSON is complete
                             try:
-                                import json
-                                current_args = function_calls[tool_call.index]["function"]["arguments"]
-                                # Try to parse as JSON to show progress
-                                if current_args.endswith('"') or current_args.endswith('}') or current_args.endswith(']'):
-                                    parsed_args = json.loads(current_args)
-                                    progress_msg = f"\n⚙️ **Function parameters:** {json.dumps(parsed_args, indent=2)}"
-                                    session.stream(progress_msg)
+                                if arg_trackers[index].feed(arguments):
+                                    parsed_args = _json_loads("".join(args_parts))
+                                    flush_content()
+                                    stream_chunk(_FN_PARAMS_PREFIX + _json_dumps_pretty(parsed_args))
                             except json.JSONDecodeError:
                                 # JSON not complete yet, don't stream partial data
                                 pass
@@ -302,24 +676,44 @@ async def process_message(data: ChatMessage) -> None:
             # Capture usage information from the last chunk
             if chunk.usage:
                 usage_info = chunk.usage
-                logger.info(f"📊 Usage info captured: {usage_info}")
         
-        logger.info("✅ OpenAI response stream complete")
+        # Send any text still buffered at the end of the stream
+        flush_content()
+        
+        logger.info(
+            "✅ OpenAI response stream complete: content_chunks=%d tool_chunks=%d response_length=%d usage=%s",
+            content_chunk_count, tool_chunk_count, response_length, usage_info
+        )
         
         # Process function calls if any were made using the function handler
-        function_result, generated_image_url = await process_function_calls(function_calls, lexia, data)
-        if function_result:
-            session.stream(function_result)
+        if tc_ids:
+            function_calls = [
+                {
+                    "id": tc_ids[index],
+                    "type": "function",
+                    "function": {
+                        "name": tc_names[index],
+                        "arguments": "".join(tc_args[index])
+                    }
+                }
+                for index in sorted(tc_ids)
+            ]
+            function_result, generated_image_url = await process_function_calls(function_calls, lexia, data)
+            if function_result:
+                session.stream(function_result)
         
-        logger.info(f"🖼️ Final generated_image_url value: {generated_image_url}")
+        logger.info("🖼️ Final generated_image_url value: %s", generated_image_url)
         
         # Finalize via session (aggregated). Include file_url if available
         final_text = lexia.close(data, usage_info, file_url=generated_image_url)
         
-        # Store response in conversation memory
-        conversation_manager.add_message(data.thread_id, "assistant", final_text)
+        # Store response in conversation memory once this request has returned; call_soon keeps
+        # the write off the response tail while preserving message order within the thread
+        asyncio.get_running_loop().call_soon(
+            conversation_manager.add_message, data.thread_id, "assistant", final_text
+        )
         
-        logger.info(f"🎉 Message processing completed successfully for thread {data.thread_id}")
+        logger.info("🎉 Message processing completed successfully for thread %s", data.thread_id)
             
     except Exception as e:
         error_msg = f"Error processing message: {str(e)}"
@@ -381,5 +775,13 @@ if __name__ == "__main__":
     print("   python main.py --prod  # Production (Centrifugo)")
     print("=" * 60)
     
-    # Start the FastAPI server
-    uvicorn.run(app, host="0.0.0.0", port=5001)
+    # Start the FastAPI server. uvicorn uses uvloop and httptools automatically
+    # when installed (uvicorn[standard]). Each worker process has its own
+    # in-memory conversation memory, so only raise WEB_CONCURRENCY when requests
+    # for a thread are routed to the same worker or memory is stored externally.
+    workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+    if workers > 1:
+        print(f"👥 Starting {workers} worker processes (WEB_CONCURRENCY)")
+        uvicorn.run("main:app", host="0.0.0.0", port=5001, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=5001)
@@ -10,6 +10,7 @@ Features:
 - Thread-based conversation management
 - Configurable history limits
 - Timestamp tracking for messages
+- Compact per-thread storage of OpenAI-shaped messages (ConversationHistory)
 - Easy extension for persistent storage
 
 Usage:
@@ -26,6 +27,7 @@ Usage:
     history = manager.get_history("thread_123")
 """
 
+from .conversation_history import ConversationHistory
 from .conversation_manager import ConversationManager
 
-__all__ = ['ConversationManager']
+__all__ = ['ConversationHistory', 'ConversationManager']
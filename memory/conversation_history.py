@@ -0,0 +1,90 @@
+"""
+Conversation History Storage
+============================
+
+Compact per-thread message storage used by the ConversationManager.
+
+Messages are stored already in OpenAI's {"role", "content"} shape, with their
+timestamps in a parallel deque. Prompt building can then pass the stored
+message dicts straight to the API, without rebuilding or filtering one dict
+per message on every request. Bounded deques drop the oldest message in O(1)
+once max_length is reached.
+
+Example:
+    history = ConversationHistory(max_length=10)
+    history.append("user", "Hello", "2024-01-01T12:00:00")
+    history.append("assistant", "Hi there!", "2024-01-01T12:00:01")
+
+    for message in history.messages:
+        print(f"{message['role']}: {message['content']}")
+"""
+
+from collections import deque
+from typing import Deque, List, Dict, Optional
+
+
+class ConversationHistory:
+    """
+    Messages of a single conversation thread, stored as OpenAI-shaped dicts.
+
+    The message dicts are shared with snapshots and prompts and must be
+    treated as read-only.
+
+    Attributes:
+        messages (Deque[Dict[str, str]]): Messages with "role" and "content" keys
+        timestamps (Deque[str]): ISO format timestamps, parallel to messages
+        max_length (int): Maximum number of messages kept, or None for unlimited
+    """
+
+    __slots__ = ('messages', 'timestamps', 'max_length')
+
+    def __init__(self, max_length: Optional[int] = None):
+        """
+        Initialize an empty conversation history.
+
+        Args:
+            max_length: Maximum number of messages to keep. Older messages are
+                       dropped when this limit is exceeded.
+        """
+        self.messages: Deque[Dict[str, str]] = deque(maxlen=max_length)
+        self.timestamps: Deque[str] = deque(maxlen=max_length)
+        self.max_length = max_length
+
+    def append(self, role: str, content: str, timestamp: str) -> None:
+        """
+        Append a message; the bounded deques drop the oldest one if max_length is exceeded.
+
+        Args:
+            role: Role of the message sender ("user" or "assistant")
+            content: The message content/text
+            timestamp: ISO format timestamp of the message
+        """
+        self.messages.append({'role': role, 'content': content})
+        self.timestamps.append(timestamp)
+
+    def copy(self) -> 'ConversationHistory':
+        """
+        Create a shallow snapshot of this history.
+
+        Returns:
+            New ConversationHistory with copies of the message and timestamp deques
+        """
+        snapshot = ConversationHistory(max_length=self.max_length)
+        snapshot.messages = self.messages.copy()
+        snapshot.timestamps = self.timestamps.copy()
+        return snapshot
+
+    def to_list(self) -> List[Dict[str, str]]:
+        """
+        Convert the history to the list-of-dictionaries format.
+
+        Returns:
+            List of message dictionaries with role, content and timestamp
+        """
+        return [
+            {'role': message['role'], 'content': message['content'], 'timestamp': timestamp}
+            for message, timestamp in zip(self.messages, self.timestamps)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.messages)
@@ -11,6 +11,8 @@ Features:
 - Configurable history limits per thread
 - Automatic timestamp tracking
 - Memory-efficient storage with automatic cleanup
+- Thread-safe, sharded storage so unrelated threads don't contend on one lock
+- Bounded thread count with least-recently-used eviction
 - Easy extension for custom storage backends
 
 Example:
@@ -31,8 +33,12 @@ Example:
     thread_count = manager.get_thread_count()
 """
 
-from typing import List, Dict, Any
-from collections import defaultdict
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Any, Tuple
+
+from .conversation_history import ConversationHistory
 
 
 class ConversationManager:
@@ -44,9 +50,15 @@ class ConversationManager:
     to use while providing all the functionality needed for basic
     conversation management.
     
+    Conversations are spread over several shards (dict + lock) by thread ID,
+    so concurrent writes to different threads rarely wait on each other.
+    Each shard keeps its threads in least-recently-used order and evicts the
+    oldest one once the shard's share of max_threads is exceeded.
+    
     Attributes:
         max_history (int): Maximum number of messages to keep per thread
-        conversations (Dict): Internal storage of conversation data
+        max_threads (int): Approximate maximum number of threads kept in memory
+        conversations (Dict): Snapshot of all ConversationHistory objects per thread
         
     Example:
         # Create manager with 15 message history limit
@@ -61,16 +73,38 @@ class ConversationManager:
         print(f"Thread has {len(history)} messages")
     """
     
-    def __init__(self, max_history: int = 10):
+    def __init__(self, max_history: int = 10, num_shards: int = 16, max_threads: int = 10_000):
         """
         Initialize the conversation manager.
         
         Args:
             max_history: Maximum number of messages to keep per thread.
                         Older messages are automatically removed when this limit is exceeded.
+            num_shards: Number of independently locked partitions of the thread store.
+            max_threads: Maximum number of threads kept in memory. The least recently
+                        updated threads are dropped first. The limit is enforced per
+                        shard, so the total can be slightly lower if threads hash unevenly.
         """
         self.max_history = max_history
-        self.conversations: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+        self.max_threads = max_threads
+        self._max_threads_per_shard = max(1, -(-max_threads // num_shards))
+        self._shards: List[Tuple["OrderedDict[str, ConversationHistory]", threading.Lock]] = [
+            (OrderedDict(), threading.Lock()) for _ in range(num_shards)
+        ]
+    
+    @property
+    def conversations(self) -> Dict[str, ConversationHistory]:
+        """
+        All conversation histories keyed by thread ID, merged across shards.
+        
+        This is a new dictionary on every access; modifying it does not
+        change the stored conversations.
+        """
+        merged: Dict[str, ConversationHistory] = {}
+        for shard, lock in self._shards:
+            with lock:
+                merged.update(shard)
+        return merged
     
     def add_message(self, thread_id: str, role: str, content: str) -> None:
         """
@@ -80,6 +114,7 @@ class ConversationManager:
         - Adding the new message with a timestamp
         - Removing old messages if the thread exceeds max_history
         - Creating the thread if it doesn't exist
+        - Evicting the least recently updated thread if max_threads is exceeded
         
         Args:
             thread_id: Unique identifier for the conversation thread
@@ -90,17 +125,19 @@ class ConversationManager:
             manager.add_message("user_123", "user", "Hello there!")
             manager.add_message("user_123", "assistant", "Hi! How can I help you?")
         """
-        message = {
-            'role': role,
-            'content': content,
-            'timestamp': self._get_timestamp()
-        }
+        shard, lock = self._get_shard(thread_id)
+        timestamp = self._get_timestamp()
         
-        self.conversations[thread_id].append(message)
-        
-        # Maintain max history limit by removing oldest messages
-        if len(self.conversations[thread_id]) > self.max_history:
-            self.conversations[thread_id].pop(0)
+        with lock:
+            history = shard.get(thread_id)
+            if history is None:
+                history = shard[thread_id] = ConversationHistory(max_length=self.max_history)
+                if len(shard) > self._max_threads_per_shard:
+                    shard.popitem(last=False)
+            else:
+                shard.move_to_end(thread_id)
+            # ConversationHistory drops the oldest message once max_history is exceeded
+            history.append(role, content, timestamp)
     
     def get_history(self, thread_id: str) -> List[Dict[str, str]]:
         """
@@ -120,7 +157,34 @@ class ConversationManager:
             for msg in history:
                 print(f"{msg['role']}: {msg['content']}")
         """
-        return self.conversations.get(thread_id, [])
+        shard, lock = self._get_shard(thread_id)
+        with lock:
+            history = shard.get(thread_id)
+            return history.to_list() if history is not None else []
+    
+    def get_conversation(self, thread_id: str) -> ConversationHistory:
+        """
+        Get the stored ConversationHistory for a specific thread.
+        
+        Unlike get_history, this returns the stored OpenAI-shaped messages
+        without building a dictionary per message. The result is a snapshot, so it is
+        safe to read while other threads keep adding messages.
+        
+        Args:
+            thread_id: The thread identifier to retrieve history for
+            
+        Returns:
+            ConversationHistory for the thread (empty if the thread is unknown)
+            
+        Example:
+            history = manager.get_conversation("user_123")
+            for message in history.messages:
+                print(f"{message['role']}: {message['content']}")
+        """
+        shard, lock = self._get_shard(thread_id)
+        with lock:
+            history = shard.get(thread_id)
+            return history.copy() if history is not None else ConversationHistory()
     
     def clear_history(self, thread_id: str) -> None:
         """
@@ -135,8 +199,9 @@ class ConversationManager:
         Example:
             manager.clear_history("user_123")  # Removes all messages for user_123
         """
-        if thread_id in self.conversations:
-            del self.conversations[thread_id]
+        shard, lock = self._get_shard(thread_id)
+        with lock:
+            shard.pop(thread_id, None)
     
     def get_all_threads(self) -> List[str]:
         """
@@ -165,7 +230,16 @@ class ConversationManager:
             count = manager.get_thread_count()
             print(f"Managing {count} conversation threads")
         """
-        return len(self.conversations)
+        return sum(len(shard) for shard, _ in self._shards)
+    
+    def _get_shard(self, thread_id: str) -> Tuple["OrderedDict[str, ConversationHistory]", threading.Lock]:
+        """
+        Get the shard (storage dict and its lock) responsible for a thread.
+        
+        Note:
+            This is a private method used internally for routing threads to shards.
+        """
+        return self._shards[hash(thread_id) % len(self._shards)]
     
     def _get_timestamp(self) -> str:
         """
@@ -178,5 +252,4 @@ class ConversationManager:
             This is a private method used internally for timestamp generation.
             Override this method if you need custom timestamp formatting.
         """
-        from datetime import datetime
         return datetime.now().isoformat()